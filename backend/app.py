@@ -3,19 +3,26 @@ from flask import Flask, request, jsonify, send_from_directory
 import base64
 import io
 from PIL import Image
-import json
 
 from backend.processors.mask_processor import MaskProcessor
 from backend.processors.sam_segmenter import SAMSegmenter
 from backend.processors.image_processor import ImageProcessor
 from backend.processors.clip_processor import CLIPProcessor
 from backend.wardrobe_guru import WardrobeGuru
+from backend.outfit_engine import OutfitEngine
+from backend.llm.tools.deepseek_response_cleaner import DeepSeekResponseCleaner
+from backend.taxonomy import load_taxonomy
 
 app = Flask(__name__, static_folder='frontend/build')
 
 segmenter = SAMSegmenter()
 image_processor = ImageProcessor()
 clip_processor = CLIPProcessor()
+taxonomy = load_taxonomy()
+outfit_engine = OutfitEngine()
+
+# Upper bound on garments segmented in one /create-segmented-image request
+MAX_PROMPTS = 16
 
 db = TinyDB("clothing_db.json")
 clothing_table = db.table("clothing_items")
@@ -30,39 +37,76 @@ def serve_react_app(path):
     # Serve any static files from the React build
     return send_from_directory(app.static_folder, path)
 
+def encode_cutout(image, mask):
+    """Applies a 0/255 mask to an RGBA image and returns (cutoutBase64, maskBase64)."""
+    encoded_mask = MaskProcessor.encode(mask)
+    cutout = MaskProcessor.apply(image, encoded_mask)
+
+    output_buffer = io.BytesIO()
+    cutout.save(output_buffer, format="PNG")
+    cutout_base64 = base64.b64encode(output_buffer.getvalue()).decode("utf-8")
+    return cutout_base64, encoded_mask
+
 @app.route("/create-segmented-image", methods=["POST"])
 def create_segmented_image():
     """
-    Receives JSON with "imageBase64" and "clickPoint".
-    Runs segmentation based on the point, applies the mask,
-    and returns the final cutout as base64.
+    Receives JSON with "imageBase64" and either "clickPoint" or "prompts".
+    With "clickPoint", segments the single garment under the point and
+    returns its cutout as base64.
+    With "prompts" (a list of {"point": {x, y}} and/or {"box": {x1, y1, x2, y2}}),
+    segments every garment against one image embedding and returns a
+    cutout, compressed mask and SAM score per prompt under "garments".
     """
     data = request.get_json()
-    if not data or "imageBase64" not in data or "clickPoint" not in data:
-        return jsonify({"error": "Missing imageBase64 or clickPoint"}), 400
+    if not data or "imageBase64" not in data or ("clickPoint" not in data and "prompts" not in data):
+        return jsonify({"error": "Missing imageBase64 or clickPoint/prompts"}), 400
 
     image_base64 = data["imageBase64"]
-    click_point = data["clickPoint"]
+
+    if "prompts" in data:
+        prompts = data["prompts"]
+        if not isinstance(prompts, list) or not prompts:
+            return jsonify({"error": "prompts must be a non-empty list"}), 400
+        if len(prompts) > MAX_PROMPTS:
+            return jsonify({"error": f"At most {MAX_PROMPTS} prompts per request"}), 400
+        try:
+            SAMSegmenter.validate_prompts(prompts)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid prompts: {str(e)}"}), 400
 
     try:
         # Decode the base64 image
         image_bytes = base64.b64decode(image_base64)
         image = Image.open(io.BytesIO(image_bytes)).convert("RGBA")
 
+        if "prompts" in data:
+            # Run segmentation for all garments in one pass
+            results = segmenter.predict_clothing_batch(image, prompts)
+
+            garments = []
+            for mask, score in results:
+                if mask is None:
+                    garments.append({"success": False, "error": "No mask found", "score": score})
+                    continue
+                cutout_base64, mask_base64 = encode_cutout(image, mask)
+                garments.append({
+                    "success": True,
+                    "cutoutBase64": cutout_base64,
+                    "maskBase64": mask_base64,
+                    "maskShape": list(mask.shape),
+                    "score": score
+                })
+
+            return jsonify({"success": True, "garments": garments})
+
         # Run segmentation using the click point
-        union_mask = segmenter.predict_clothing_interactive(image, click_point)
+        union_mask = segmenter.predict_clothing_interactive(image, data["clickPoint"])
 
         if union_mask is None:
             return jsonify({"error": "No mask found"}), 400
 
-        encoded_mask = MaskProcessor.encode(union_mask)
         # Apply the mask to extract the cutout
-        cutout = MaskProcessor.apply(image, encoded_mask)
-
-        # Convert the cutout to base64
-        output_buffer = io.BytesIO()
-        cutout.save(output_buffer, format="PNG")
-        cutout_base64 = base64.b64encode(output_buffer.getvalue()).decode("utf-8")
+        cutout_base64, _ = encode_cutout(image, union_mask)
 
         return jsonify({"success": True, "cutoutBase64": cutout_base64})
 
@@ -81,6 +125,9 @@ def identify_image():
         return jsonify({"error": "Missing cutoutBase64"}), 400
 
     try:
+        # ✅ Re-encode the label embeddings if the taxonomy changed on disk
+        taxonomy.refresh()
+
         # ✅ Decode the image
         image_bytes = base64.b64decode(image_base64)
         image = Image.open(io.BytesIO(image_bytes)).convert("RGBA")
@@ -124,8 +171,16 @@ def save_to_wardrobe():
             "imageBase64": data["cutoutBase64"],
         }
 
+        # Store the SigLIP embedding for local outfit scoring; OutfitEngine copes without it
+        try:
+            image = Image.open(io.BytesIO(base64.b64decode(data["cutoutBase64"]))).convert("RGBA")
+            item["embedding"] = clip_processor.encode_images([image])[0].tolist()
+        except Exception as e:
+            print("Error encoding clothing item, saving without embedding:", e)
+
         doc_id = clothing_table.insert(item)
         item["id"] = doc_id  # Add doc_id for reference
+        item.pop("embedding", None)
 
         return jsonify({"success": True, **item}), 201
 
@@ -138,6 +193,8 @@ def save_to_wardrobe():
 def get_clothing_items():
     """Fetch all clothing items with their ID."""
     items = [{"id": item.doc_id, **item} for item in clothing_table.all()]
+    for item in items:
+        item.pop("embedding", None)
     return jsonify(items)
 
 
@@ -150,35 +207,67 @@ def delete_clothing_item(item_id):
     clothing_table.remove(doc_ids=[item_id])
     return jsonify({"success": True})
 
+def without_blobs(item):
+    """Returns a copy of a clothing item without its image and embedding."""
+    return {key: value for key, value in item.items() if key not in ("imageBase64", "embedding")}
+
 @app.route('/suggest-outfit', methods=['POST'])
 def suggest_outfit():
+    """
+    Suggests an outfit for the weather.
+    With "mode": "local" the outfit comes straight from OutfitEngine.
+    Otherwise the engine's shortlist is handed to the LLM, and the local
+    pick is used if the LLM is unavailable.
+    """
     data = request.get_json()
     weather_info = data.get("weather")
+    mode = data.get("mode", "llm")
+
+    # Keep OutfitEngine's category and colour tables in step with clothing_types.json
+    taxonomy.refresh()
+
+    wardrobe = [{"id": item.doc_id, **item} for item in clothing_table.all()]
+    try:
+        temperature = float(weather_info)
+    except (TypeError, ValueError):
+        temperature = None
+
+    # Rank outfits locally first, this only takes milliseconds
+    outfits = [
+        {"items": [without_blobs(item) for item in outfit["items"]], "score": outfit["score"]}
+        for outfit in outfit_engine.suggest(wardrobe, temperature)
+    ]
+    local_response = OutfitEngine.describe(outfits[0]) if outfits else "No valid outfit found in your wardrobe."
+
+    if mode == "local":
+        return jsonify({"suggested_outfit": local_response, "outfits": outfits, "source": "local"})
+
     # get the clothing table with the images removed
-    clothing_table_no_images = clothing_table.all()
-    for item in clothing_table_no_images:
-        item.pop("imageBase64")
-    guru = WardrobeGuru()
-    response = guru.get_outfit_from_deepseek(clothing_table_no_images, weather_info)
+    clothing_table_no_images = [without_blobs(item) for item in wardrobe]
+    try:
+        guru = WardrobeGuru()
+        response = guru.get_outfit_from_deepseek(clothing_table_no_images, weather_info, shortlist=outfits)
+    except Exception as e:
+        print("Error getting outfit from LLM:", e)
+        response = DeepSeekResponseCleaner.NO_OUTFIT
+
+    if response == DeepSeekResponseCleaner.NO_OUTFIT:
+        return jsonify({"suggested_outfit": local_response, "outfits": outfits, "source": "local"})
 
-    return jsonify({"suggested_outfit": response})
+    return jsonify({"suggested_outfit": response, "outfits": outfits, "source": "llm"})
 
 @app.route("/fashion-options", methods=["GET"])
 def get_fashion_options():
     """Returns available clothing types, colors, patterns, and styles."""
     try:
-        with open("backend/clothing_types.json", "r") as f:
-            fashion_data = json.load(f)
-
-        # Flatten clothing categories into a single list
-        clothing_types = [item for category in fashion_data["categories"].values() for item in category]
-
-        return jsonify({
-            "clothingTypes": clothing_types,
-            "colors": fashion_data["colors"],
-            "patterns": fashion_data["patterns"],
-            "styles": fashion_data["styles"]
-        })
+        # Picks up edits to clothing_types.json without a restart
+        taxonomy.refresh()
+
+        response = app.response_class(taxonomy.options_body, mimetype="application/json")
+        response.set_etag(taxonomy.etag)
+        response.last_modified = taxonomy.last_modified
+        response.cache_control.no_cache = True  # Always revalidate, 304 when unchanged
+        return response.make_conditional(request)
 
     except Exception as e:
         return jsonify({"error": f"Failed to load fashion options: {str(e)}"}), 500
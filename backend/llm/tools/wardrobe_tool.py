@@ -1,6 +1,15 @@
 class WardrobeTool:
     """Generates a formatted prompt based on the wardrobe and weather conditions."""
 
+    @staticmethod
+    def describe_item(item):
+        """Describes an item by colour, type, pattern and style so equal types can be told apart."""
+        colors = ", ".join(item["colors"]) if isinstance(item["colors"], list) else item["colors"]
+        pattern = f" with a {item['pattern']} pattern" if item.get("pattern") and item[
+            "pattern"].lower() != "solid" else ""
+        style = f"({item['style']})" if item.get("style") else ""
+        return f"{colors} {item['clothingType']}{pattern} {style}".rstrip()
+
     def run(self, data):
         wardrobe = data.get("wardrobe")  # ✅ Wardrobe is now guaranteed to exist
         weather = data.get("weather", "Unknown weather")  # ✅ Get weather safely
@@ -15,12 +24,14 @@ class WardrobeTool:
             if not isinstance(item, dict) or "clothingType" not in item or "colors" not in item or "style" not in item:
                 raise ValueError("Each clothing item must have 'clothingType', 'colors', and 'style'.")
 
-            colors = ", ".join(item["colors"]) if isinstance(item["colors"], list) else item["colors"]
-            pattern = f" with a {item['pattern']} pattern" if item.get("pattern") and item[
-                "pattern"].lower() != "solid" else ""
-            style = f"({item['style']})" if item.get("style") else ""
+            prompt += f"- Your {self.describe_item(item)}\n"
 
-            prompt += f"- Your {colors} {item['clothingType']}{pattern} {style}\n"
+        shortlist = data.get("shortlist")
+        if shortlist:
+            prompt += "\nThese outfits from the wardrobe already score well together, best first:\n"
+            for rank, outfit in enumerate(shortlist, start=1):
+                prompt += f"{rank}. " + "; ".join(f"your {self.describe_item(item)}" for item in outfit["items"]) + "\n"
+            prompt += "Pick one of them unless it clearly doesn't suit the weather.\n"
 
         prompt += "\nProvide a single complete outfit that is stylish and well-coordinated.\n"
         prompt += "Make sure not to have multiple equivalent items, e.g. tshirt and a polo.\n"
@@ -0,0 +1,201 @@
+import itertools
+import numpy as np
+
+from backend.taxonomy import load_taxonomy
+
+# Below these temperatures (°C) an outfit needs a mid layer / outerwear too
+MID_LAYER_BELOW = 16
+OUTERWEAR_BELOW = 10
+
+# Colour families used for harmony; anything not listed falls back to its last word
+NEUTRAL_COLOURS = {"black", "white", "gray", "light gray", "dark gray", "navy",
+                   "beige", "tan", "khaki", "camel", "light brown", "dark brown"}
+COLOUR_FAMILIES = {
+    "burgundy": "red", "maroon": "red", "salmon": "pink", "fuchsia": "pink", "magenta": "pink",
+    "teal": "blue", "turquoise": "blue", "cyan": "blue", "olive": "green", "mint": "green",
+    "gold": "yellow", "mustard": "yellow", "rust": "orange", "lavender": "purple", "violet": "purple",
+}
+COMPLEMENTARY_FAMILIES = {("blue", "orange"), ("purple", "yellow"), ("green", "pink"), ("blue", "yellow")}
+
+# Patterns that pair with anything; two other patterns in one outfit clash
+QUIET_PATTERNS = {"solid", "denim"}
+
+# Weights of each term in the pairwise compatibility score
+COLOUR_WEIGHT = 1.0
+STYLE_WEIGHT = 0.6
+PATTERN_WEIGHT = 0.5
+EMBEDDING_WEIGHT = 0.8
+
+# Upper bound on the outfits scored in one pass
+MAX_COMBINATIONS = 1_000_000
+
+
+class OutfitEngine:
+    """
+    Ranks outfits from the wardrobe locally, without the LLM.
+    Enumerates every valid top/bottom (or one-piece) combination with the
+    layers the weather calls for, and scores all of them at once with
+    pairwise compatibility matrices.
+    """
+
+    def __init__(self):
+        self.taxonomy = load_taxonomy()
+        self.taxonomy.add_reload_listener(self.load_tables)
+        self.load_tables(self.taxonomy)
+
+    def load_tables(self, taxonomy):
+        """Builds the label lookups and colour harmony matrix from the taxonomy."""
+        families = [self._colour_family(colour) for colour in taxonomy.colors]
+        n = len(families)
+        colour_harmony = np.full((n, n), 0.3, dtype=np.float32)
+        for i, j in itertools.product(range(n), repeat=2):
+            a, b = families[i], families[j]
+            if "neutral" in (a, b):
+                colour_harmony[i, j] = 1.0
+            elif a == b:
+                colour_harmony[i, j] = 0.8
+            elif (a, b) in COMPLEMENTARY_FAMILIES or (b, a) in COMPLEMENTARY_FAMILIES:
+                colour_harmony[i, j] = 0.6
+
+        self.category_of = {label: category for category, labels in taxonomy.categories.items() for label in labels}
+        self.colour_index = {colour: i for i, colour in enumerate(taxonomy.colors)}
+        self.style_index = {style: i for i, style in enumerate(taxonomy.styles)}
+        self.colour_harmony = colour_harmony
+
+    @staticmethod
+    def _colour_family(colour):
+        if colour in NEUTRAL_COLOURS:
+            return "neutral"
+        return COLOUR_FAMILIES.get(colour, colour.split()[-1])
+
+    def required_slots(self, temperature):
+        """Returns the layer categories the weather calls for on top of the base outfit."""
+        slots = []
+        if temperature is not None and temperature < MID_LAYER_BELOW:
+            slots.append("Mid Layers")
+        if temperature is not None and temperature < OUTERWEAR_BELOW:
+            slots.append("Outerwear")
+        return slots
+
+    def _features(self, items):
+        """Stacks colour, style, pattern and embedding features for a list of items."""
+        colours = np.zeros((len(items), len(self.colour_index)), dtype=np.float32)
+        styles = np.zeros((len(items), len(self.style_index)), dtype=np.float32)
+        loud = np.zeros(len(items), dtype=np.float32)
+
+        for row, item in enumerate(items):
+            item_colours = item["colors"] if isinstance(item["colors"], list) else [item["colors"]]
+            for colour in item_colours:
+                if colour in self.colour_index:
+                    colours[row, self.colour_index[colour]] = 1.0
+            if item.get("style") in self.style_index:
+                styles[row, self.style_index[item["style"]]] = 1.0
+            loud[row] = float(bool(item.get("pattern")) and item["pattern"].lower() not in QUIET_PATTERNS)
+
+        # Average over each item's colours so multi-colour items aren't favoured
+        colours /= np.maximum(colours.sum(axis=1, keepdims=True), 1.0)
+
+        # Items saved without an embedding get a zero row, so only their own
+        # pairs lose the embedding term rather than the whole slot
+        embeddings = None
+        present = [row for row, item in enumerate(items) if item.get("embedding")]
+        if present:
+            embeddings = np.zeros((len(items), len(items[present[0]]["embedding"])), dtype=np.float32)
+            embeddings[present] = [items[row]["embedding"] for row in present]
+            embeddings[present] /= np.linalg.norm(embeddings[present], axis=1, keepdims=True)
+
+        return {"colours": colours, "styles": styles, "loud": loud, "embeddings": embeddings}
+
+    def _pair_scores(self, a, b, use_embeddings=True):
+        """Compatibility of every item in slot a with every item in slot b."""
+        scores = COLOUR_WEIGHT * (a["colours"] @ self.colour_harmony @ b["colours"].T)
+        scores += STYLE_WEIGHT * (a["styles"] @ b["styles"].T)
+        scores -= PATTERN_WEIGHT * np.outer(a["loud"], b["loud"])
+        if use_embeddings and a["embeddings"] is not None and b["embeddings"] is not None:
+            scores += EMBEDDING_WEIGHT * (a["embeddings"] @ b["embeddings"].T)
+        return scores
+
+    def _rank(self, slot_items, top_n, baseline=0.0):
+        """
+        Scores the full cartesian product of the slots and returns the top_n
+        combinations along with the mean score of all of them.
+        A lone slot has no pairs to score, so its items get baseline plus how far
+        their own colour/style/pattern coherence sits from the slot's average.
+        """
+        features = [self._features(items) for items in slot_items]
+        pairs = list(itertools.combinations(range(len(slot_items)), 2))
+        pair_scores = {(i, j): self._pair_scores(features[i], features[j]) for i, j in pairs}
+
+        # Keep the product bounded for very large wardrobes by dropping the items
+        # of each slot that match the other slots worst on average
+        per_slot = int(MAX_COMBINATIONS ** (1 / len(slot_items)))
+        if np.prod([len(items) for items in slot_items]) > MAX_COMBINATIONS:
+            for s in range(len(slot_items)):
+                if len(slot_items[s]) <= per_slot:
+                    continue
+                affinity = sum(scores.mean(axis=1) for (i, j), scores in pair_scores.items() if i == s)
+                affinity = affinity + sum(scores.mean(axis=0) for (i, j), scores in pair_scores.items() if j == s)
+                keep = np.sort(np.argpartition(-affinity, per_slot - 1)[:per_slot])
+                slot_items[s] = [slot_items[s][k] for k in keep]
+                for (i, j), scores in pair_scores.items():
+                    if i == s:
+                        pair_scores[(i, j)] = scores[keep]
+                    elif j == s:
+                        pair_scores[(i, j)] = scores[:, keep]
+
+        shape = tuple(len(items) for items in slot_items)
+        total = np.zeros(shape, dtype=np.float32)
+        for (i, j), scores in pair_scores.items():
+            view = [1] * len(shape)
+            view[i], view[j] = shape[i], shape[j]
+            total += scores.reshape(view)
+        if pairs:
+            total /= len(pairs)
+        else:
+            # An item's embedding always matches itself, so it says nothing here
+            coherence = np.diag(self._pair_scores(features[0], features[0], use_embeddings=False))
+            total += baseline + (coherence - coherence.mean())
+
+        flat = total.ravel()
+        top_n = min(top_n, flat.size)
+        best = np.argpartition(-flat, top_n - 1)[:top_n]
+        best = best[np.argsort(-flat[best])]
+
+        ranked = [
+            ([slot_items[s][k] for s, k in enumerate(np.unravel_index(index, shape))], float(flat[index]))
+            for index in best
+        ]
+        return ranked, float(flat.mean())
+
+    def suggest(self, wardrobe, temperature=None, top_n=5):
+        """
+        Returns up to top_n outfits as {"items": [...], "score": float}, best first.
+        Outfits are a top and a bottom or a one-piece, plus a mid layer and
+        outerwear when it is cold enough and the wardrobe has them.
+        """
+        by_category = {}
+        for item in wardrobe:
+            by_category.setdefault(self.category_of.get(item.get("clothingType"), "Other"), []).append(item)
+
+        layers = [by_category[slot] for slot in self.required_slots(temperature) if slot in by_category]
+
+        ranked = []
+        # One-pieces without layers are placed around the average top+bottom score
+        baseline = 0.0
+        if "Tops" in by_category and "Bottoms" in by_category:
+            separates, baseline = self._rank([by_category["Tops"], by_category["Bottoms"], *layers], top_n)
+            ranked += separates
+        if "Dresses & One-Pieces" in by_category:
+            ranked += self._rank([by_category["Dresses & One-Pieces"], *layers], top_n, baseline)[0]
+
+        ranked.sort(key=lambda outfit: outfit[1], reverse=True)
+        return [{"items": items, "score": round(score, 4)} for items, score in ranked[:top_n]]
+
+    @staticmethod
+    def describe(outfit):
+        """Formats an outfit as a short message for the chat window."""
+        pieces = []
+        for item in outfit["items"]:
+            colors = ", ".join(item["colors"]) if isinstance(item["colors"], list) else item["colors"]
+            pieces.append(f"your {colors} {item['clothingType']}")
+        return "How about " + ", ".join(pieces[:-1]) + (" and " if len(pieces) > 1 else "") + pieces[-1] + "? 👕"
@@ -1,6 +1,9 @@
+import json
+import numpy as np
 import open_clip
 import torch
-import json
+
+from backend.taxonomy import load_taxonomy
 
 class CLIPProcessor:
     def __init__(self, device=None):
@@ -16,45 +19,86 @@ class CLIPProcessor:
         )
         self.tokenizer = open_clip.get_tokenizer('hf-hub:Marqo/marqo-fashionSigLIP')
 
-        # Load all fashion-related data from one JSON
-        with open("backend/clothing_types.json", "r") as f:
-            fashion_data = json.load(f)
+        # Text embeddings of each label list, keyed by the labels themselves
+        self.text_features = {}
 
-        # Extract relevant sections
-        self.color_labels = fashion_data["colors"]
-        self.pattern_labels = fashion_data["patterns"]
-        self.style_labels = fashion_data["styles"]
+        # Optional Fashion200k reference index, see load_reference_index
+        self.reference_embeddings = None
+        self.reference_labels = None
+        self.reference_label_index = None
 
-        # ✅ Properly flatten clothing categories into a single list
-        self.clothing_labels = [
-            item for category in fashion_data["categories"].values() for item in category
-        ]
+        # Load all fashion-related data from the shared taxonomy and
+        # re-encode the label embeddings whenever the file is reloaded
+        self.taxonomy = load_taxonomy()
+        self.taxonomy.add_reload_listener(self.load_labels)
+        self.load_labels(self.taxonomy)
+
+    def load_labels(self, taxonomy):
+        """Reads the label sets from the taxonomy and pre-encodes their text embeddings."""
+        label_sets = (taxonomy.clothing_labels, taxonomy.colors, taxonomy.patterns, taxonomy.styles)
+
+        # Encode everything before swapping, so a failure leaves the previous labels intact
+        text_features = {tuple(labels): self._encode_text(labels) for labels in label_sets}
+
+        self.clothing_labels, self.color_labels, self.pattern_labels, self.style_labels = label_sets
+        self.text_features = text_features
+
+    def _encode_text(self, labels):
+        """Returns normalised text embeddings for labels."""
+        text_inputs = self.tokenizer(labels).to(self.device)
+        with torch.no_grad(), torch.amp.autocast(self.device):
+            text_features = self.model.encode_text(text_inputs)
+            text_features /= text_features.norm(dim=-1, keepdim=True)
+        return text_features
+
+    def _encode_labels(self, labels):
+        """Returns normalised text embeddings for labels, encoding them only once."""
+        key = tuple(labels)
+        if key not in self.text_features:
+            self.text_features[key] = self._encode_text(labels)
+        return self.text_features[key]
 
     def _classify(self, image, labels, top_k=3):
         """Classifies an image against a given set of labels and returns top-k matches."""
-        image = self.preprocess(image).unsqueeze(0).to(self.device)
-        text_inputs = self.tokenizer(labels).to(self.device)
+        return self._classify_batch([image], labels, top_k=top_k)[0]
+
+    def _classify_batch(self, images, labels, top_k=3):
+        """Classifies several images in one forward pass and returns top-k matches per image."""
+        if not images:
+            return []
+
+        image = torch.stack([self.preprocess(img) for img in images]).to(self.device)
+        text_features = self._encode_labels(labels)
 
         with torch.no_grad(), torch.amp.autocast(self.device):
             image_features = self.model.encode_image(image)
-            text_features = self.model.encode_text(text_inputs)
 
             # Normalise the embeddings
             image_features /= image_features.norm(dim=-1, keepdim=True)
-            text_features /= text_features.norm(dim=-1, keepdim=True)
 
             # Get softmaxed similarity scores
             similarities = (100.0 * image_features @ text_features.T).softmax(dim=-1)
 
         top_results = [
-            {
-                "label": labels[i],
-                "confidence": round(similarities[0, i].item(), 4)
-            }
-            for i in similarities.argsort(descending=True)[0][:top_k]
+            [
+                {
+                    "label": labels[i],
+                    "confidence": round(row[i].item(), 4)
+                }
+                for i in row.argsort(descending=True)[:top_k]
+            ]
+            for row in similarities
         ]
         return top_results
 
+    def encode_images(self, images):
+        """Returns normalised image embeddings for several images as a NumPy array."""
+        image = torch.stack([self.preprocess(img) for img in images]).to(self.device)
+        with torch.no_grad(), torch.amp.autocast(self.device):
+            image_features = self.model.encode_image(image)
+            image_features /= image_features.norm(dim=-1, keepdim=True)
+        return image_features.float().cpu().numpy()
+
     def classify_clothing(self, image):
         """Classify clothing type from image."""
         return self._classify(image, self.clothing_labels)
@@ -70,3 +114,53 @@ class CLIPProcessor:
     def classify_style(self, image):
         """Classify style (e.g. 'casual', 'formal', 'summer', etc.)."""
         return self._classify(image, self.style_labels)
+
+    def classify_clothing_batch(self, images):
+        """Classify clothing type for several cutouts at once."""
+        return self._classify_batch(images, self.clothing_labels)
+
+    def classify_colors_batch(self, images, top_k=3):
+        """Classify colours for several cutouts at once."""
+        return self._classify_batch(images, self.color_labels, top_k=top_k)
+
+    def load_reference_index(self, embeddings_path, labels_path, label_index_path):
+        """
+        Loads the Fashion200k reference index written by scripts/prepare_fashion_labels.py.
+        The embeddings stay memory-mapped rather than being read into RAM.
+        """
+        self.reference_embeddings = np.load(embeddings_path, mmap_mode="r")
+        self.reference_label_index = np.load(label_index_path)
+        with open(labels_path, "r") as f:
+            self.reference_labels = json.load(f)
+
+    def suggest_labels(self, image, top_k=5, neighbours=50, chunk_size=50000):
+        """
+        Suggests Fashion200k category3 labels from the image's nearest neighbours
+        in the reference index, scored by summed similarity.
+        """
+        if self.reference_embeddings is None:
+            raise RuntimeError("No reference index loaded, call load_reference_index first")
+
+        query = self.encode_images([image])[0].astype(np.float32)
+
+        # Scan the memory-mapped array in chunks to keep memory flat
+        similarities = np.concatenate([
+            self.reference_embeddings[start:start + chunk_size].astype(np.float32) @ query
+            for start in range(0, len(self.reference_embeddings), chunk_size)
+        ])
+
+        neighbours = min(neighbours, len(similarities))
+        nearest = np.argpartition(-similarities, neighbours - 1)[:neighbours]
+
+        votes = {}
+        for row in nearest:
+            label_index = self.reference_label_index[row]
+            if label_index >= 0:
+                label = self.reference_labels[label_index]
+                votes[label] = votes.get(label, 0.0) + float(similarities[row])
+
+        total = sum(votes.values()) or 1.0
+        return [
+            {"label": label, "confidence": round(score / total, 4)}
+            for label, score in sorted(votes.items(), key=lambda vote: vote[1], reverse=True)[:top_k]
+        ]
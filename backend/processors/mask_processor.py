@@ -48,4 +48,24 @@ class MaskProcessor:
         image_data[:, :, 3] = np.where(mask_data == 0, 0, 255)
 
         # 5. Return as PIL Image
-        return Image.fromarray(image_data)
\ No newline at end of file
+        return Image.fromarray(image_data)
+
+    @staticmethod
+    def cutout(image: Image, mask: np.ndarray) -> Image.Image:
+        """
+        Applies a 0/255 NumPy mask directly to the image and crops the result to
+        the mask's bounding box. Pixels outside the mask are made transparent and
+        flattened to white, so models that drop alpha (e.g. CLIP) only see the garment.
+        Returns the resulting RGBA PIL Image.
+        """
+        image_data = np.array(image.convert("RGBA"))
+        outside = mask == 0
+        image_data[outside, :3] = 255
+        image_data[:, :, 3] = np.where(outside, 0, 255)
+
+        coords = np.argwhere(~outside)
+        if coords.shape[0] == 0:
+            return Image.fromarray(image_data)
+        y_min, x_min = coords.min(axis=0)
+        y_max, x_max = coords.max(axis=0) + 1
+        return Image.fromarray(image_data[y_min:y_max, x_min:x_max])
@@ -8,6 +8,15 @@ from PIL import Image
 
 from segment_anything import sam_model_registry, SamAutomaticMaskGenerator, SamPredictor
 
+# Speed/quality presets for automatic whole-photo segmentation.
+# "quality" is the exhaustive grid with a crop layer; the others use a coarser
+# grid with no crop layers, seeded only where the garment-region prior fires.
+SEGMENT_PRESETS = {
+    "fast": {"points_per_side": 8, "crop_n_layers": 0, "use_prior": True},
+    "balanced": {"points_per_side": 16, "crop_n_layers": 0, "use_prior": True},
+    "quality": {"points_per_side": 32, "crop_n_layers": 1, "use_prior": False},
+}
+
 class SAMSegmenter:
     def __init__(self, model_path="backend/sam_vit_h_4b8939.pth", cache_dir="cache"):
         """Initialize the SAM model for automatic segmentation and cache masks."""
@@ -37,6 +46,17 @@ class SAMSegmenter:
             min_mask_region_area=100  # Requires open-cv for post-processing
         )
 
+        # Masks with an IoU above this are fragments of one garment and get merged
+        self.merge_iou = 0.5
+        # A mask more than this fraction covered by smaller masks inside it is a
+        # container (whole subject or outfit) and is dropped in favour of its parts
+        self.container_coverage = 0.6
+        # A mask more than this fraction inside a larger kept garment is a part of it
+        # (pocket, logo, print) rather than a garment of its own
+        self.part_containment = 0.8
+        # Masks smaller than this fraction of the image are never garments
+        self.min_area_fraction = 0.01
+
         # Also initialize a predictor for interactive segmentation
         sam_predictor_model = sam_model_registry["vit_h"](checkpoint=model_path).to(self.device)
         sam_predictor_model.to(device=self.device)
@@ -95,4 +115,193 @@ class SAMSegmenter:
         union_mask = masks[0].astype(np.uint8) * 255
 
         print(f"Elapsed time (interactive): {time.time() - start_time:.6f}s")
-        return union_mask
\ No newline at end of file
+        return union_mask
+
+    @staticmethod
+    def validate_prompts(prompts: list):
+        """Raises ValueError unless every prompt has a numeric point and/or box."""
+        required_keys = {"point": ("x", "y"), "box": ("x1", "y1", "x2", "y2")}
+        for index, prompt in enumerate(prompts):
+            if not isinstance(prompt, dict) or not ("point" in prompt or "box" in prompt):
+                raise ValueError(f"Prompt {index} needs a 'point' or a 'box'")
+            for kind, keys in required_keys.items():
+                if kind not in prompt:
+                    continue
+                value = prompt[kind]
+                if not isinstance(value, dict) or not all(
+                        isinstance(value.get(key), (int, float)) and not isinstance(value.get(key), bool)
+                        for key in keys):
+                    raise ValueError(f"Prompt {index} '{kind}' needs numeric {', '.join(keys)}")
+
+    def predict_clothing_batch(self, pil_image: Image.Image, prompts: list):
+        """
+        Segments several garments from one image embedding.
+        Each prompt is a dict with a "point" ({"x", "y"}), a "box"
+        ({"x1", "y1", "x2", "y2"}) or both. Prompts of the same shape are run
+        through the predictor as one batch.
+        Returns a list of (mask, score) in prompt order, with mask as 0/255
+        uint8 or None when SAM found nothing for that prompt.
+        """
+        # Check the prompts before paying for the image embedding
+        self.validate_prompts(prompts)
+        start_time = time.time()
+
+        # Convert from RGBA → RGB and embed the image once
+        np_image = np.array(pil_image.convert("RGB"))
+        self.predictor.set_image(np_image)
+
+        # Group prompts by shape so each group can be stacked into one batch
+        groups = {}
+        for index, prompt in enumerate(prompts):
+            groups.setdefault(("point" in prompt, "box" in prompt), []).append(index)
+
+        results = [None] * len(prompts)
+        for (has_point, has_box), indices in groups.items():
+            point_coords = point_labels = boxes = None
+            if has_point:
+                points = np.array([[[prompts[i]["point"]["x"], prompts[i]["point"]["y"]]] for i in indices])
+                point_coords = self.predictor.transform.apply_coords_torch(
+                    torch.as_tensor(points, dtype=torch.float, device=self.device), np_image.shape[:2]
+                )
+                point_labels = torch.ones(point_coords.shape[:2], dtype=torch.int, device=self.device)
+            if has_box:
+                box_array = np.array([
+                    [prompts[i]["box"][k] for k in ("x1", "y1", "x2", "y2")] for i in indices
+                ])
+                boxes = self.predictor.transform.apply_boxes_torch(
+                    torch.as_tensor(box_array, dtype=torch.float, device=self.device), np_image.shape[:2]
+                )
+
+            masks, scores, _ = self.predictor.predict_torch(
+                point_coords=point_coords,
+                point_labels=point_labels,
+                boxes=boxes,
+                multimask_output=False,  # Single mask output per garment
+            )
+
+            masks = masks[:, 0].cpu().numpy()
+            scores = scores[:, 0].cpu().numpy()
+            for i, mask, score in zip(indices, masks, scores):
+                if not mask.any():
+                    results[i] = (None, float(score))
+                else:
+                    results[i] = (mask.astype(np.uint8) * 255, float(score))
+
+        print(f"Elapsed time (batch of {len(prompts)}): {time.time() - start_time:.6f}s")
+        return results
+
+    @staticmethod
+    def garment_prior(np_image: np.ndarray, size=64, threshold=40):
+        """
+        Cheap garment-region prior for wardrobe photos.
+        Estimates the background colour from the image border on a thumbnail and
+        marks pixels that differ from it. Returns a (size, size) boolean map.
+        """
+        thumbnail = cv2.resize(np_image, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+        border = np.concatenate([thumbnail[0], thumbnail[-1], thumbnail[:, 0], thumbnail[:, -1]])
+        background = np.median(border, axis=0)
+
+        prior = np.linalg.norm(thumbnail - background, axis=-1) > threshold
+        prior = cv2.morphologyEx(prior.astype(np.uint8), cv2.MORPH_CLOSE, np.ones((3, 3), np.uint8)) > 0
+
+        # A busy background gives no usable prior; fall back to the whole frame
+        if prior.mean() < 0.02 or prior.mean() > 0.95:
+            return np.ones((size, size), dtype=bool)
+        return prior
+
+    def _prior_point_grid(self, prior: np.ndarray, points_per_side: int):
+        """Keeps the points of a regular normalised grid that land on the prior."""
+        offset = 1 / (2 * points_per_side)
+        coords = np.linspace(offset, 1 - offset, points_per_side)
+        grid = np.stack(np.meshgrid(coords, coords), axis=-1).reshape(-1, 2)
+
+        size = prior.shape[0]
+        cells = np.minimum((grid * size).astype(int), size - 1)
+        keep = prior[cells[:, 1], cells[:, 0]]
+        return grid[keep] if keep.any() else grid
+
+    def _merge_masks(self, masks, prior):
+        """Merges overlapping SAM masks into one 0/255 mask per garment, largest first."""
+        if not masks:
+            return []
+
+        h, w = masks[0].shape
+        prior_full = cv2.resize(prior.astype(np.uint8), (w, h), interpolation=cv2.INTER_NEAREST) > 0
+
+        garments = []
+        for mask in sorted(masks, key=lambda m: m.sum(), reverse=True):
+            area = mask.sum()
+            # Skip the background, specks and anything that is mostly off the garment prior
+            if (area > 0.95 * mask.size or area < self.min_area_fraction * mask.size
+                    or (mask & prior_full).sum() < 0.5 * area):
+                continue
+
+            for garment in garments:
+                overlap = (garment & mask).sum()
+                if overlap > self.merge_iou * (area + garment.sum() - overlap):
+                    garment |= mask
+                    break
+            else:
+                garments.append(mask.copy())
+
+        # Drop containers: masks mostly made up of smaller garments that lie inside them
+        areas = [garment.sum() for garment in garments]
+        kept = []
+        for i, garment in enumerate(garments):
+            covered = np.zeros_like(garment)
+            for j, other in enumerate(garments):
+                if areas[j] < areas[i] and (garment & other).sum() > 0.8 * areas[j]:
+                    covered |= other
+            if (covered & garment).sum() <= self.container_coverage * areas[i]:
+                kept.append(garment)
+
+        # Drop parts: masks lying mostly inside a larger garment that was kept
+        garments, kept = kept, []
+        for garment in garments:
+            area = garment.sum()
+            if not any((garment & other).sum() > self.part_containment * area for other in kept):
+                kept.append(garment)
+
+        return [garment.astype(np.uint8) * 255 for garment in kept]
+
+    def segment_clothing(self, pil_image: Image.Image, image_file=None, preset="fast"):
+        """
+        Automatically segments every garment in a photo.
+        Returns a list of 0/255 uint8 masks, one per garment, largest first.
+        When image_file is given the merged masks are cached per preset.
+        """
+        if preset not in SEGMENT_PRESETS:
+            raise ValueError(f"Unknown preset '{preset}', expected one of {list(SEGMENT_PRESETS)}")
+
+        cache_path = None
+        if image_file:
+            cache_path = os.path.join(self.cache_dir, f"{os.path.splitext(image_file)[0]}_{preset}.npz")
+            if os.path.exists(cache_path):
+                return list(np.load(cache_path)["masks"])
+
+        start_time = time.time()
+        settings = SEGMENT_PRESETS[preset]
+        np_image = np.array(pil_image.convert("RGB"))
+        prior = self.garment_prior(np_image)
+
+        if settings["use_prior"]:
+            mask_generator = SamAutomaticMaskGenerator(
+                model=self.model,
+                points_per_side=None,
+                point_grids=[self._prior_point_grid(prior, settings["points_per_side"])],
+                pred_iou_thresh=0.86,
+                stability_score_thresh=0.92,
+                crop_n_layers=settings["crop_n_layers"],
+                min_mask_region_area=100
+            )
+        else:
+            mask_generator = self.mask_generator
+
+        results = mask_generator.generate(np_image)
+        masks = self._merge_masks([result["segmentation"] for result in results], prior)
+
+        if cache_path:
+            np.savez_compressed(cache_path, masks=np.array(masks, dtype=np.uint8).reshape(-1, *np_image.shape[:2]))
+
+        print(f"Elapsed time (automatic, {preset}): {time.time() - start_time:.6f}s, {len(masks)} garments")
+        return masks
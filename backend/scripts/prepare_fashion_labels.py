@@ -1,43 +1,151 @@
+# Run from the repository root as a module, so the backend package is importable:
+#   python -m backend.scripts.prepare_fashion_labels [--embeddings ...]
+# To encode in several processes, extract the labels and create the embeddings file once first;
+# the shard runs then only encode images:
+#   python -m backend.scripts.prepare_fashion_labels --embeddings --init
+#   python -m backend.scripts.prepare_fashion_labels --embeddings --num-shards 4 --shard-index <0-3>
+import argparse
 import os
 from datasets import load_dataset
 import json
+import numpy as np
 
 # ✅ Define paths
 CACHE_DIR = os.path.expanduser("~/.cache/fashion200k")  # Your dataset cache
 LABELS_FILE = os.path.join(CACHE_DIR, "fashion_labels.json")  # Save only category3 labels
+LABEL_INDEX_FILE = os.path.join(CACHE_DIR, "fashion_label_index.npy")  # Row → position in LABELS_FILE, -1 if unlabelled
+EMBEDDINGS_FILE = os.path.join(CACHE_DIR, "fashion_embeddings.npy")  # Memory-mapped SigLIP image embeddings
 
 
 def load_fashion200k():
     """Load the Fashion200k dataset from cache."""
     print("Loading Fashion200k dataset...")
-    return load_dataset("Marqo/fashion200k", cache_dir=CACHE_DIR)
+    # ✅ Reuse the prepared Arrow files in the cache instead of re-downloading
+    return load_dataset("Marqo/fashion200k", cache_dir=CACHE_DIR, split="data",
+                        download_mode="reuse_dataset_if_exists")
 
 
-def generate_category3_labels(dataset):
-    """Extract and clean category3 labels from Fashion200k."""
-    category3_labels = set()
+def clean_category3(batch):
+    """Strips and lower-cases a batch of category3 labels."""
+    return {"category3": [cat3.strip().lower() for cat3 in batch["category3"]]}
 
-    dataset_split = dataset["data"]  # ✅ Use the correct dataset split
 
-    for item in dataset_split:
-        cat3 = item["category3"].strip().lower()
-        if cat3:
-            category3_labels.add(cat3)
+def generate_category3_labels(dataset, num_proc=None):
+    """
+    Extract and clean category3 labels from Fashion200k.
+    Returns the sorted unique labels and each row's index into them (-1 if empty).
+    """
+    # ✅ Only touch the label column, so images are never decoded
+    categories = dataset.select_columns(["category3"]).map(clean_category3, batched=True, num_proc=num_proc)
+    labels, label_index = np.unique(np.array(categories["category3"]), return_inverse=True)
 
-    return sorted(category3_labels)  # Return sorted unique labels
+    labels = labels.tolist()
+    label_index = label_index.astype(np.int32)
+    if labels and labels[0] == "":
+        labels = labels[1:]
+        label_index -= 1
 
+    return labels, label_index  # Return sorted unique labels
 
-def save_labels(labels):
+
+def save_labels(labels, label_index):
     """Save extracted category3 labels to a JSON file for caching."""
     with open(LABELS_FILE, "w") as f:
         json.dump(labels, f, indent=4)
+    np.save(LABEL_INDEX_FILE, label_index)
     print(f"✅ Category3 labels saved to {LABELS_FILE}")
 
 
+def load_clip_processor():
+    """Imports and creates the CLIPProcessor, which needs the backend package on the path."""
+    try:
+        from backend.processors.clip_processor import CLIPProcessor
+    except ImportError as e:
+        raise SystemExit(f"Run this script as 'python -m backend.scripts.prepare_fashion_labels' "
+                         f"from the repository root ({e})")
+    return CLIPProcessor()
+
+
+def get_embedding_dim(dataset, clip_processor):
+    """Encodes the first image to find the SigLIP embedding size."""
+    return clip_processor.encode_images([dataset[0]["image"].convert("RGB")]).shape[1]
+
+
+def init_embeddings(dataset, clip_processor):
+    """Creates (or recreates) the empty memory-mapped EMBEDDINGS_FILE for the whole dataset."""
+    embedding_dim = get_embedding_dim(dataset, clip_processor)
+    embeddings = np.lib.format.open_memmap(EMBEDDINGS_FILE, mode="w+", dtype=np.float16,
+                                           shape=(len(dataset), embedding_dim))
+    embeddings.flush()
+    print(f"✅ Created {EMBEDDINGS_FILE} with shape {embeddings.shape}")
+
+
+def open_embeddings(dataset, clip_processor):
+    """Opens EMBEDDINGS_FILE for writing, checking it was created for this dataset and model."""
+    embedding_dim = get_embedding_dim(dataset, clip_processor)
+    if not os.path.exists(EMBEDDINGS_FILE):
+        raise SystemExit(f"{EMBEDDINGS_FILE} does not exist, create it first with --embeddings --init")
+
+    embeddings = np.load(EMBEDDINGS_FILE, mmap_mode="r+")
+    expected_shape = (len(dataset), embedding_dim)
+    if embeddings.shape != expected_shape or embeddings.dtype != np.float16:
+        raise SystemExit(f"{EMBEDDINGS_FILE} has shape {embeddings.shape} and dtype {embeddings.dtype}, "
+                         f"expected {expected_shape} float16; recreate it with --embeddings --init")
+    return embeddings
+
+
+def precompute_embeddings(dataset, clip_processor, num_shards=1, shard_index=0, batch_size=64):
+    """
+    Encodes the images of one contiguous shard with SigLIP in batches and
+    writes them into the shared memory-mapped EMBEDDINGS_FILE at their row positions.
+    Shards can run as separate processes once the file exists (see init_embeddings).
+    """
+    embeddings = open_embeddings(dataset, clip_processor)
+
+    # ✅ Contiguous shards map to one block of rows in the array
+    shard = dataset.select_columns(["image"]).shard(num_shards, shard_index, contiguous=True)
+    offset = (len(dataset) // num_shards) * shard_index + min(shard_index, len(dataset) % num_shards)
+
+    row = offset
+    for batch in shard.iter(batch_size=batch_size):
+        batch_embeddings = clip_processor.encode_images([image.convert("RGB") for image in batch["image"]])
+        embeddings[row:row + len(batch_embeddings)] = batch_embeddings
+        row += len(batch_embeddings)
+        print(f"Encoded {row - offset}/{len(shard)} images of shard {shard_index}", end="\r")
+
+    embeddings.flush()
+    print(f"\n✅ Embeddings for rows {offset}-{row} saved to {EMBEDDINGS_FILE}")
+
+
 if __name__ == "__main__":
-    # ✅ Run the script to extract and save only category3 labels
+    parser = argparse.ArgumentParser(description="Extract Fashion200k labels and optionally SigLIP embeddings.")
+    parser.add_argument("--num-proc", type=int, default=os.cpu_count(), help="Processes for label cleaning")
+    parser.add_argument("--embeddings", action="store_true", help="Also precompute SigLIP image embeddings")
+    parser.add_argument("--batch-size", type=int, default=64, help="Images per SigLIP batch")
+    parser.add_argument("--num-shards", type=int, default=1, help="Split the embedding pass into this many shards")
+    parser.add_argument("--shard-index", type=int, default=0, help="Which shard this process encodes")
+    parser.add_argument("--init", action="store_true",
+                        help="Extract labels and create the empty embeddings file; run once before starting shards")
+    args = parser.parse_args()
+    if args.num_shards > 1 and not args.init and not args.embeddings:
+        parser.error("sharded runs only encode embeddings; pass --embeddings, or --init to extract labels")
+
     dataset = load_fashion200k()
-    labels = generate_category3_labels(dataset)
-    save_labels(labels)
 
-    print("🔥 Fashion200k Category3 Labels Extracted & Cached Successfully!")
+    # ✅ Extract labels once: in the --init step or a single unsharded run,
+    # never in the shard processes, which would all rewrite the same files
+    if args.init or args.num_shards == 1:
+        labels, label_index = generate_category3_labels(dataset, num_proc=args.num_proc)
+        save_labels(labels, label_index)
+
+        print("🔥 Fashion200k Category3 Labels Extracted & Cached Successfully!")
+
+    if args.embeddings:
+        clip_processor = load_clip_processor()
+        if args.init:
+            init_embeddings(dataset, clip_processor)
+        else:
+            # A single process has nobody to race with, so it may create the file itself
+            if args.num_shards == 1 and not os.path.exists(EMBEDDINGS_FILE):
+                init_embeddings(dataset, clip_processor)
+            precompute_embeddings(dataset, clip_processor, args.num_shards, args.shard_index, args.batch_size)
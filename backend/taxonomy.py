@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+CLOTHING_TYPES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "clothing_types.json")
+
+
+class FashionTaxonomy:
+    """
+    Shared view of clothing_types.json.
+    Parses the file once, re-parses it when its mtime changes and keeps
+    the flattened /fashion-options response ready to serve.
+    """
+
+    def __init__(self, path=CLOTHING_TYPES_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._mtime = None
+
+        self.categories = {}
+        self.materials = {}
+        self.colors = []
+        self.patterns = []
+        self.styles = []
+        self.clothing_labels = []
+        self.options_body = b""
+        self.etag = None
+        self.last_modified = None
+
+        self.refresh()
+
+    def add_reload_listener(self, callback):
+        """Registers callback(taxonomy), called after every reload of the file."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def refresh(self):
+        """Reloads the taxonomy if the file changed on disk. Returns True if it was reloaded."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as e:
+            return self._keep_previous(e)
+        if mtime == self._mtime:
+            return False
+
+        with self._lock:
+            try:
+                # Another thread may have reloaded while we waited for the lock
+                mtime = os.stat(self.path).st_mtime_ns
+                if mtime == self._mtime:
+                    return False
+
+                with open(self.path, "rb") as f:
+                    raw = f.read()
+                fashion_data = json.loads(raw)
+                categories = fashion_data["categories"]
+                colors = fashion_data["colors"]
+                patterns = fashion_data["patterns"]
+                styles = fashion_data["styles"]
+                # Flatten clothing categories into a single list
+                clothing_labels = [item for category in categories.values() for item in category]
+            except OSError as e:
+                # e.g. an editor replacing the file by rename; try again next time
+                return self._keep_previous(e)
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                # e.g. a half-saved edit; remember this mtime so the broken
+                # file isn't re-parsed on every request
+                result = self._keep_previous(e)
+                self._mtime = mtime
+                return result
+
+            self.categories = categories
+            self.materials = fashion_data.get("materials", {})
+            self.colors = colors
+            self.patterns = patterns
+            self.styles = styles
+            self.clothing_labels = clothing_labels
+
+            self.options_body = json.dumps({
+                "clothingTypes": self.clothing_labels,
+                "colors": self.colors,
+                "patterns": self.patterns,
+                "styles": self.styles
+            }).encode("utf-8")
+            self.etag = hashlib.sha1(raw).hexdigest()
+            self.last_modified = datetime.fromtimestamp(mtime // 1_000_000_000, tz=timezone.utc)
+            self._mtime = mtime
+
+            for callback in self._listeners:
+                try:
+                    callback(self)
+                except Exception as e:
+                    print(f"⚠️ Taxonomy reload listener {callback!r} failed: {e}")
+
+        return True
+
+    def _keep_previous(self, error):
+        """Keeps serving the last good taxonomy after a failed reload; fails if there is none yet."""
+        if self._mtime is None:
+            raise error
+        print(f"⚠️ Failed to reload {self.path}, keeping previous taxonomy: {error}")
+        return False
+
+
+_taxonomies = {}
+_taxonomies_lock = threading.Lock()
+
+
+def load_taxonomy(path=CLOTHING_TYPES_PATH):
+    """Returns the shared FashionTaxonomy for path, parsing it on first use."""
+    key = os.path.abspath(path)
+    with _taxonomies_lock:
+        if key not in _taxonomies:
+            _taxonomies[key] = FashionTaxonomy(key)
+        return _taxonomies[key]
@@ -29,7 +29,10 @@ class WardrobeGuru:
         # Compile the graph
         self.pipeline = self.graph.compile()
 
-    def get_outfit_from_deepseek(self, wardrobe, weather):
-        """ Runs the LangGraph pipeline with the wardrobe input and returns the cleaned LLM response. """
-        result = self.pipeline.invoke({"wardrobe": wardrobe, "weather": weather})  # ✅ Correct input structure
+    def get_outfit_from_deepseek(self, wardrobe, weather, shortlist=None):
+        """
+        Runs the LangGraph pipeline with the wardrobe input and returns the cleaned LLM response.
+        An optional shortlist of pre-ranked outfits from OutfitEngine narrows the LLM's choice.
+        """
+        result = self.pipeline.invoke({"wardrobe": wardrobe, "weather": weather, "shortlist": shortlist})  # ✅ Correct input structure
         return result
\ No newline at end of file
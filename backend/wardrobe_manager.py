@@ -3,23 +3,47 @@ import os
 import numpy as np
 from PIL import Image
 
+from backend.taxonomy import CLOTHING_TYPES_PATH, load_taxonomy
+
 class WardrobeManager:
-    def __init__(self, clothing_json="clothing_types.json", colours_json="colours.json", wardrobe_json="wardrobe.json"):
+    def __init__(self, clothing_json=CLOTHING_TYPES_PATH, colours_json="colours.json", wardrobe_json="wardrobe.json",
+                 compact_every=500):
         """Loads clothing types, materials, and wardrobe storage."""
         self.wardrobe_json = wardrobe_json
-
-        # ✅ Load clothing categories and materials
-        with open(clothing_json, "r") as f:
-            clothing_data = json.load(f)
-            self.categories = clothing_data["categories"]
-            self.materials = clothing_data["materials"]
+        # Additions are appended here as JSON lines and folded into wardrobe_json on compaction
+        self.journal_json = wardrobe_json + ".journal"
+        # Compact once the journal holds at least as many items as the snapshot
+        # (and never below compact_every), so total bytes written stay linear
+        self.compact_every = compact_every
+        self.journal_entries = 0
+        # Every journal entry gets the next sequence number; the snapshot records
+        # the last one folded into it so replay can skip entries it already holds
+        self.journal_seq = 0
+
+        # ✅ Clothing categories and materials come from the shared taxonomy
+        self.taxonomy = load_taxonomy(clothing_json)
 
         # ✅ Load existing wardrobe if it exists
         try:
             with open(self.wardrobe_json, "r") as f:
-                self.wardrobe_data = json.load(f)["wardrobe"]
+                snapshot = json.load(f)
+            self.wardrobe_data = snapshot["wardrobe"]
+            self.journal_seq = snapshot.get("journal_seq", 0)
         except FileNotFoundError:
             self.wardrobe_data = []
+        self.category_index = {entry["type"]: entry for entry in self.wardrobe_data}
+        self.snapshot_items = sum(len(entry["items"]) for entry in self.wardrobe_data)
+
+        # ✅ Replay additions made since the last compaction
+        self._replay_journal()
+
+    @property
+    def categories(self):
+        return self.taxonomy.categories
+
+    @property
+    def materials(self):
+        return self.taxonomy.materials
 
     def categorize_item(self, clothing_label):
         """Finds the category of a clothing item."""
@@ -32,24 +56,96 @@ class WardrobeManager:
         """Gets material for a clothing item, defaulting to 'unknown fabric'."""
         return self.materials.get(clothing_label, "unknown fabric")
 
-    def add_to_wardrobe(self, item_data, category):
-        """Adds an item to the wardrobe and saves the JSON."""
-        # ✅ Ensure the category exists
-        category_entry = next((c for c in self.wardrobe_data if c["type"] == category), None)
-        if not category_entry:
+    def _replay_journal(self):
+        """Applies journaled additions newer than the snapshot, ignoring a torn last line."""
+        try:
+            with open(self.journal_json, "r") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                if any(rest.strip() for rest in lines[line_number:]):
+                    raise ValueError(f"Corrupt entry on line {line_number} of {self.journal_json}")
+                # A crash mid-append can only leave the final line incomplete
+                print(f"⚠️ Skipping incomplete journal entry in {self.journal_json}")
+                # Compact now so later appends don't land after the torn line
+                self.compact()
+                return
+
+            # Entries up to journal_seq are already in the snapshot, e.g. after a
+            # crash between writing the snapshot and removing the journal
+            if entry["seq"] <= self.journal_seq:
+                continue
+            self._add_in_memory(entry["item"], entry["type"])
+            self.journal_seq = entry["seq"]
+            self.journal_entries += 1
+
+    def _add_in_memory(self, item_data, category):
+        """Appends an item to its category, creating the category if needed."""
+        category_entry = self.category_index.get(category)
+        if category_entry is None:
             category_entry = {"type": category, "items": []}
             self.wardrobe_data.append(category_entry)
-
-        # ✅ Append the new item
+            self.category_index[category] = category_entry
         category_entry["items"].append(item_data)
 
-        # ✅ Save the updated wardrobe
+    def add_to_wardrobe(self, item_data, category):
+        """Adds an item to the wardrobe and journals it to disk."""
+        self.add_many([(item_data, category)])
+
+    def add_many(self, items):
+        """Adds (item_data, category) pairs with a single journal write."""
+        items = list(items)
+        if not items:
+            return
+
+        lines = [
+            json.dumps({"seq": self.journal_seq + offset, "type": category, "item": item_data}) + "\n"
+            for offset, (item_data, category) in enumerate(items, start=1)
+        ]
+
+        # ✅ Append only the new items, not the whole wardrobe, and only touch
+        # memory once they are safely on disk
+        with open(self.journal_json, "a") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+        for item_data, category in items:
+            self._add_in_memory(item_data, category)
+        self.journal_seq += len(items)
+        self.journal_entries += len(items)
+
+        if self.journal_entries >= max(self.compact_every, self.snapshot_items):
+            self.compact()
+
+    def compact(self):
+        """Folds the journal into the wardrobe snapshot and clears it."""
         self.save_wardrobe(self.wardrobe_data)
 
     def save_wardrobe(self, wardrobe_data):
-        """Saves wardrobe data to JSON."""
-        with open(self.wardrobe_json, "w") as f:
-            json.dump({"wardrobe": wardrobe_data}, f, indent=4)
+        """Atomically replaces the wardrobe JSON with wardrobe_data and clears the journal."""
+        tmp_path = self.wardrobe_json + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"wardrobe": wardrobe_data, "journal_seq": self.journal_seq}, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.wardrobe_json)
+
+        # The snapshot now holds everything up to journal_seq, so the journal can go
+        if os.path.exists(self.journal_json):
+            os.remove(self.journal_json)
+        self.journal_entries = 0
+
+        self.wardrobe_data = wardrobe_data
+        self.category_index = {entry["type"]: entry for entry in self.wardrobe_data}
+        self.snapshot_items = sum(len(entry["items"]) for entry in self.wardrobe_data)
 
     import numpy as np
     from PIL import Image